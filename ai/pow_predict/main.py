@@ -1,4 +1,6 @@
+import asyncio
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from datetime import datetime
 from typing import Dict, Any, Optional
@@ -6,10 +8,13 @@ import uvicorn
 from pipeline import make_prediction
 from data_lookup import smart_lookup
 from pipeline import run_training_pipeline
+from profiling import install_profiling
 
 _SETUP_TRAINING = False
+_SETUP_LOCK = asyncio.Lock()
 
 app = FastAPI(title="MLOps Energy API", version="1.0.0")
+install_profiling(app)
 
 
 class PredictionRequest(BaseModel):
@@ -34,9 +39,11 @@ class PredictionResponse(BaseModel):
 async def predict(request: PredictionRequest):
     global _SETUP_TRAINING
 
-    if not _SETUP_TRAINING:
-        run_training_pipeline()
-        _SETUP_TRAINING = True
+    # Train off the event loop, once; the parallel model search is CLI-only
+    async with _SETUP_LOCK:
+        if not _SETUP_TRAINING:
+            await run_in_threadpool(run_training_pipeline, search=False)
+            _SETUP_TRAINING = True
 
     try:
         req_data = request.model_dump()
@@ -2,14 +2,17 @@ import numpy as np
 import pandas as pd
 import pickle
 import logging
+import time
+from multiprocessing import Pool
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import warnings
 
-from sklearn.model_selection import train_test_split
+from threadpoolctl import threadpool_limits
+from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import mean_squared_error, r2_score
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
 
 warnings.filterwarnings("ignore")
 
@@ -25,6 +28,10 @@ class Config:
     TARGET_COL = "kwh_per_share_per_month"
     TEST_SIZE = 0.2
     RANDOM_STATE = 42
+    CV_FOLDS = 3
+    SEARCH_BUDGET_SECONDS = 120
+    SEARCH_WORKERS = None  # None = one process per CPU core
+    LATENCY_RUNS = 50
 
     def __init__(self):
         for directory in [self.MODELS_DIR, self.LOGS_DIR]:
@@ -40,9 +47,137 @@ class Config:
         self.logger = logging.getLogger(__name__)
 
 
-def run_training_pipeline(data_path: Optional[str] = None):
+# Estimator backends and the candidate configurations tried for each.
+# The first candidate of the first backend is the default: it is trained
+# without a search when `search=False`, and is the fallback if no candidate
+# finishes cross-validation within the search budget.
+ESTIMATOR_BACKENDS = {
+    "hist_gradient_boosting": HistGradientBoostingRegressor,
+    "random_forest": RandomForestRegressor,
+}
+CANDIDATE_PARAMS = {
+    "hist_gradient_boosting": [
+        {"max_iter": 300, "learning_rate": 0.05, "max_leaf_nodes": 31},
+        {"max_iter": 500, "learning_rate": 0.05, "max_leaf_nodes": 15},
+        {"max_iter": 200, "learning_rate": 0.1, "max_leaf_nodes": 63},
+    ],
+    "random_forest": [
+        {"n_estimators": 100, "max_depth": 12},
+    ],
+}
+
+
+def build_estimator(backend: str, params: Dict, random_state: int, n_jobs: int = 1):
+    params = {**params, "random_state": random_state}
+    if backend == "random_forest":
+        params["n_jobs"] = n_jobs
+    return ESTIMATOR_BACKENDS[backend](**params)
+
+
+def _cross_validate_candidate(
+    backend: str, params: Dict, X: pd.DataFrame, y: pd.Series, config: Dict
+) -> Dict:
+    # Runs in a worker process; each candidate is single-threaded so the pool
+    # itself provides the parallelism.
+    start = time.perf_counter()
+    model = build_estimator(backend, params, config["random_state"])
+    with threadpool_limits(limits=1):
+        scores = cross_val_score(model, X, y, cv=config["cv_folds"], scoring="r2")
+    return {
+        "backend": backend,
+        "params": params,
+        "cv_r2": float(np.mean(scores)),
+        "cv_seconds": time.perf_counter() - start,
+    }
+
+
+def select_model(
+    X: pd.DataFrame, y: pd.Series, config: Config, backends: List[str], budget: float
+) -> Dict:
+    """Cross-validate candidate configurations in parallel and return the best.
+
+    Worker processes still running when `budget` seconds run out are terminated.
+    """
+    unknown = [b for b in backends if b not in ESTIMATOR_BACKENDS]
+    if unknown:
+        raise ValueError(
+            f"Unknown backend(s) {unknown}, expected one of {list(ESTIMATOR_BACKENDS)}"
+        )
+    candidates = [(b, p) for b in backends for p in CANDIDATE_PARAMS[b]]
+    cv_config = {"random_state": config.RANDOM_STATE, "cv_folds": config.CV_FOLDS}
+
+    pool = Pool(processes=config.SEARCH_WORKERS)
+    try:
+        pending = [
+            pool.apply_async(_cross_validate_candidate, (b, p, X, y, cv_config))
+            for b, p in candidates
+        ]
+        deadline = time.monotonic() + budget
+        for result in pending:
+            result.wait(max(0.0, deadline - time.monotonic()))
+    finally:
+        # Kill unfinished candidates so they don't compete with the refit
+        pool.terminate()
+        pool.join()
+
+    results = []
+    not_done = [r for r in pending if not r.ready()]
+    for result in pending:
+        if not result.ready():
+            continue
+        try:
+            results.append(result.get())
+        except Exception as e:
+            config.logger.warning(f"Candidate failed during cross-validation: {e}")
+
+    for result in sorted(results, key=lambda r: r["cv_r2"], reverse=True):
+        config.logger.info(
+            f"CV {result['backend']} {result['params']} - "
+            f"R2: {result['cv_r2']:.4f} ({result['cv_seconds']:.1f}s)"
+        )
+    if not_done:
+        config.logger.warning(
+            f"{len(not_done)} candidate(s) exceeded the {budget}s search budget"
+        )
+
+    if not results:
+        backend, params = candidates[0]
+        config.logger.warning(f"No candidate finished, falling back to {backend}")
+        return {"backend": backend, "params": params, "cv_r2": None}
+    return max(results, key=lambda r: r["cv_r2"])
+
+
+def measure_single_row_latency(model, X: pd.DataFrame, runs: int) -> float:
+    """Median latency in milliseconds of predicting one row."""
+    row = X.iloc[[0]]
+    model.predict(row)  # warm-up
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def run_training_pipeline(
+    data_path: Optional[str] = None,
+    backend: Optional[str] = None,
+    budget: Optional[float] = None,
+    search: bool = True,
+):
+    """Train and save the model.
+
+    With no `backend`, candidates of every backend in ESTIMATOR_BACKENDS are
+    compared; otherwise only that backend's candidates are. `budget` is the
+    model selection wall-clock limit in seconds (default SEARCH_BUDGET_SECONDS).
+    With `search=False` the default candidate is trained directly, without
+    forking a process pool (used by the API).
+    """
     config = Config()
-    config.logger.info("Starting simplified training pipeline (RandomForest)")
+    if budget is None:
+        budget = config.SEARCH_BUDGET_SECONDS
+    backends = [backend] if backend else list(ESTIMATOR_BACKENDS)
+    config.logger.info(f"Starting training pipeline (backends: {backends})")
 
     try:
         # 1. Load Data
@@ -106,33 +241,60 @@ def run_training_pipeline(data_path: Optional[str] = None):
         X_train_final = X_train_processed[feature_order]
         X_test_final = X_test_processed[feature_order]
 
-        # 4. Train Single Model (RandomForest)
-        config.logger.info("Training RandomForestRegressor...")
-        model = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=12,
-            random_state=config.RANDOM_STATE,
-            n_jobs=-1,  # Use all CPU cores
+        # 4. Model Selection (parallel cross-validation)
+        if search:
+            best = select_model(X_train_final, y_train, config, backends, budget)
+        else:
+            best = {
+                "backend": backends[0],
+                "params": CANDIDATE_PARAMS[backends[0]][0],
+                "cv_r2": None,
+            }
+
+        # 5. Train Chosen Model
+        config.logger.info(f"Training {best['backend']} {best['params']}...")
+        model = build_estimator(
+            best["backend"], best["params"], config.RANDOM_STATE, n_jobs=-1
         )
+        start = time.perf_counter()
         model.fit(X_train_final, y_train)
+        train_seconds = time.perf_counter() - start
 
-        # 5. Evaluate
+        # 6. Evaluate
         y_pred = model.predict(X_test_final)
         r2 = r2_score(y_test, y_pred)
         rmse = np.sqrt(mean_squared_error(y_test, y_pred))
+        latency_ms = measure_single_row_latency(
+            model, X_test_final, config.LATENCY_RUNS
+        )
+        model_bytes = pickle.dumps(model)
 
-        config.logger.info(f"Model Performance - R2: {r2:.4f}, RMSE: {rmse:.4f}")
+        config.logger.info(
+            f"Model Performance - R2: {r2:.4f}, RMSE: {rmse:.4f}, "
+            f"Train time: {train_seconds:.2f}s, Size: {len(model_bytes) / 1024:.1f} KiB, "
+            f"Single-row latency: {latency_ms:.3f}ms"
+        )
 
-        # 6. Save Artifacts
+        # 7. Save Artifacts
         with open(config.MODEL_PATH, "wb") as f:
-            pickle.dump(model, f)
+            f.write(model_bytes)
 
         # Save encoders AND the exact feature order expected by the model
         artifact_data = {"encoders": encoders, "feature_order": feature_order}
         with open(config.ENCODERS_PATH, "wb") as f:
             pickle.dump(artifact_data, f)
 
-        return {"success": True, "model": "RandomForest", "r2_score": r2}
+        return {
+            "success": True,
+            "model": best["backend"],
+            "params": best["params"],
+            "cv_r2_score": best["cv_r2"],
+            "r2_score": r2,
+            "rmse": rmse,
+            "train_seconds": train_seconds,
+            "model_size_bytes": len(model_bytes),
+            "single_row_latency_ms": latency_ms,
+        }
 
     except Exception as e:
         config.logger.error(f"Pipeline error: {e}")
@@ -193,5 +355,13 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--data", help="Path to training data")
+    parser.add_argument(
+        "--backend",
+        choices=list(ESTIMATOR_BACKENDS),
+        help="Only try this estimator backend (default: compare all)",
+    )
+    parser.add_argument(
+        "--budget", type=float, help="Model selection wall-clock budget in seconds"
+    )
     args = parser.parse_args()
-    run_training_pipeline(args.data)
+    run_training_pipeline(args.data, args.backend, args.budget)
@@ -0,0 +1,199 @@
+"""Opt-in per-request profiling.
+
+Disabled by default: unless PROFILING_ENABLED is set, `install_profiling` does
+not register anything and requests go straight to the app.
+
+When enabled, a request is profiled if it sends `X-Profile: 1` (or true/yes) or is
+picked by PROFILING_SAMPLE_RATE. Each profile is written to PROFILING_DIR,
+which is kept as a ring of at most PROFILING_MAX_FILES artifacts, and its file
+name is returned in the `X-Profile-Id` response header.
+
+Modes (PROFILING_MODE):
+    cprofile - cProfile of the event loop thread, saved as `.prof`
+               (open with `python -m pstats` or snakeviz).
+    sample   - wall-clock stack sampling of every thread, saved as `.folded`
+               (flamegraph.pl / speedscope). Use this for sync endpoints,
+               which FastAPI runs in a worker thread that cProfile won't see.
+               Idle threads are skipped and each stack is prefixed with its
+               thread name.
+
+Neither mode isolates the profiled request: cprofile also records any other
+coroutine that runs on the event loop meanwhile, and sample records every
+busy thread, including workers serving other requests. Profiles are only
+clean when the service is otherwise idle.
+"""
+
+import cProfile
+import itertools
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+MODES = ("cprofile", "sample")
+TRUTHY = ("1", "true", "yes")
+# Leaf frames of threads that are blocked waiting for work, not doing any
+IDLE_LEAVES = {
+    ("select", "selectors.py"),
+    ("wait", "threading.py"),
+    ("_worker", "thread.py"),
+}
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingConfig:
+    def __init__(self, default_mode: str = "cprofile"):
+        self.enabled = os.getenv("PROFILING_ENABLED", "0").lower() in TRUTHY
+        self.sample_rate = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+        self.mode = os.getenv("PROFILING_MODE", default_mode)
+        self.output_dir = Path(
+            os.getenv("PROFILING_DIR", Path(__file__).resolve().parent / "profiles")
+        )
+        self.max_files = int(os.getenv("PROFILING_MAX_FILES", "50"))
+        self.sample_interval = float(os.getenv("PROFILING_SAMPLE_INTERVAL", "0.005"))
+
+        if self.mode not in MODES:
+            raise ValueError(
+                f"PROFILING_MODE must be one of {MODES}, got {self.mode!r}"
+            )
+
+
+class ProfileRing:
+    """Bounded directory of profile artifacts; the oldest are deleted first."""
+
+    def __init__(self, directory: Path, max_files: int):
+        self.directory = directory
+        self.max_files = max(1, max_files)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def next_name(self, path: str, suffix: str) -> str:
+        # Zero-padded timestamp first so lexical order == chronological order
+        slug = path.strip("/").replace("/", "_") or "root"
+        return f"{time.time_ns():020d}-{next(self._counter):06d}-{slug}{suffix}"
+
+    def commit(self):
+        with self._lock:
+            artifacts = sorted(
+                p for p in self.directory.iterdir() if p.suffix in (".prof", ".folded")
+            )
+            for stale in artifacts[: -self.max_files]:
+                stale.unlink(missing_ok=True)
+
+
+class StackSampler:
+    """Samples the stacks of all busy threads into folded-stack counts."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                leaf = (frame.f_code.co_name, Path(frame.f_code.co_filename).name)
+                if leaf in IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name})")
+                    frame = frame.f_back
+                stack.append(f"thread {names.get(ident, ident)}")
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles selected requests."""
+
+    def __init__(self, app, config: ProfilingConfig):
+        self.app = app
+        self.config = config
+        self.ring = ProfileRing(config.output_dir, config.max_files)
+        # cProfile can't be enabled twice at once, so profile one request at a time
+        self._busy = threading.Lock()
+
+    def _wants_profile(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER and value.decode("latin-1").lower() in TRUTHY:
+                return True
+        return random.random() < self.config.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not self._busy.acquire(blocking=False):
+            logger.info(f"Profiler busy, not profiling {scope['path']}")
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            suffix = ".prof" if self.config.mode == "cprofile" else ".folded"
+            name = self.ring.next_name(scope["path"], suffix)
+
+            async def send_with_id(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((PROFILE_ID_HEADER, name.encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            if self.config.mode == "cprofile":
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    await self.app(scope, receive, send_with_id)
+                finally:
+                    profiler.disable()
+                    profiler.dump_stats(self.config.output_dir / name)
+                    self.ring.commit()
+                    logger.info(f"Wrote profile {name}")
+            else:
+                sampler = StackSampler(self.config.sample_interval)
+                sampler.start()
+                try:
+                    await self.app(scope, receive, send_with_id)
+                finally:
+                    sampler.stop()
+                    sampler.dump(self.config.output_dir / name)
+                    self.ring.commit()
+                    logger.info(f"Wrote profile {name}")
+        finally:
+            self._busy.release()
+
+
+def install_profiling(app, default_mode: str = "cprofile") -> bool:
+    """Register the profiling middleware on `app` if PROFILING_ENABLED is set."""
+    config = ProfilingConfig(default_mode)
+    if not config.enabled:
+        return False
+    app.add_middleware(ProfilingMiddleware, config=config)
+    return True
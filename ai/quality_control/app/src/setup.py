@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
@@ -18,6 +19,13 @@ FEATURE_NAMES = [
     "AC_POWER",
 ]
 KAGGLE_DATASET = "anikannal/solar-power-generation-data"
+N_IRR_BINS = 10
+
+# Chunked (out-of-core) training, enabled with CHUNKED_TRAINING=1
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "100000"))
+MEDIAN_SAMPLE_SIZE = 10_000  # per irradiation bin, for approximate medians
+TRAIN_SAMPLE_SIZE = 200_000  # stratified reservoir the classifier is fit on
+GENERATION_DATETIME_FORMATS = ["%d-%m-%Y %H:%M", "%Y-%m-%d %H:%M:%S"]
 
 
 def download_data():
@@ -88,6 +96,147 @@ def clean_and_engineer_features(df: pd.DataFrame) -> pd.DataFrame:
     return df_day
 
 
+def parse_datetime(values: pd.Series) -> pd.Series:
+    """Parse DATE_TIME using whichever known format fits (plants differ)."""
+    for fmt in GENERATION_DATETIME_FORMATS:
+        try:
+            return pd.to_datetime(values, format=fmt)
+        except ValueError:
+            continue
+    return pd.to_datetime(values)
+
+
+def iter_daylight_chunks(chunksize: int = CHUNK_SIZE):
+    """Stream merged, feature-engineered daylight rows plant by plant.
+
+    Only one plant's weather data and one chunk of generation data are held
+    in memory at a time.
+    """
+    for gen_path in sorted(DATA_PATH.glob("Plant_*_Generation_Data.csv")):
+        weather_path = gen_path.with_name(
+            gen_path.name.replace("Generation_Data", "Weather_Sensor_Data")
+        )
+        weather = pd.read_csv(
+            weather_path,
+            usecols=[
+                "DATE_TIME",
+                "PLANT_ID",
+                "AMBIENT_TEMPERATURE",
+                "MODULE_TEMPERATURE",
+                "IRRADIATION",
+            ],
+        )
+        weather["DATE_TIME"] = pd.to_datetime(weather["DATE_TIME"])
+
+        for gen in pd.read_csv(gen_path, chunksize=chunksize):
+            gen["DATE_TIME"] = parse_datetime(gen["DATE_TIME"])
+            df = gen.merge(weather, on=["DATE_TIME", "PLANT_ID"], how="inner")
+            yield clean_and_engineer_features(df)
+
+
+def irradiation_bin_edges(irr_min: float, irr_max: float) -> np.ndarray:
+    """Same edges as `pd.cut(..., bins=N_IRR_BINS)` over [irr_min, irr_max]."""
+    edges = np.linspace(irr_min, irr_max, N_IRR_BINS + 1)
+    edges[0] -= (irr_max - irr_min) * 0.001
+    return edges
+
+
+def _bottom_k(df: pd.DataFrame, k: int) -> pd.DataFrame:
+    # Keeping the k rows with the smallest random keys is a uniform sample
+    # without replacement of everything seen so far (mergeable reservoir).
+    return df.nsmallest(k, "_KEY") if len(df) > k else df
+
+
+def _add_sample_keys(df: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    return df.assign(_KEY=rng.random(len(df)))
+
+
+def compute_bin_stats(chunks, edges: np.ndarray, seed: int = 42):
+    """Streaming per-bin EFFICIENCY median (approximate) and std, plus scaler.
+
+    Std is exact (Chan's parallel update); the median is taken from a
+    MEDIAN_SAMPLE_SIZE reservoir per bin. The scaler is fit with `partial_fit`.
+    """
+    rng = np.random.default_rng(seed)
+    count = np.zeros(N_IRR_BINS)
+    mean = np.zeros(N_IRR_BINS)
+    m2 = np.zeros(N_IRR_BINS)
+    samples = {}
+    scaler = StandardScaler()
+
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        scaler.partial_fit(chunk[FEATURE_NAMES])
+
+        chunk = chunk.assign(IRR_BIN=pd.cut(chunk["IRRADIATION"], edges, labels=False))
+        stats = chunk.groupby("IRR_BIN")["EFFICIENCY"].agg(["count", "mean"])
+        stats["m2"] = (
+            chunk.groupby("IRR_BIN")["EFFICIENCY"].var(ddof=0) * stats["count"]
+        )
+        idx = stats.index.to_numpy(dtype=int)
+        n_b, mean_b, m2_b = (stats[c].to_numpy() for c in ["count", "mean", "m2"])
+        total = count[idx] + n_b
+        delta = mean_b - mean[idx]
+        m2[idx] += m2_b + delta**2 * count[idx] * n_b / total
+        mean[idx] += delta * n_b / total
+        count[idx] = total
+
+        keyed = _add_sample_keys(chunk[["IRR_BIN", "EFFICIENCY"]], rng)
+        for irr_bin, group in keyed.groupby("IRR_BIN"):
+            kept = samples.get(irr_bin)
+            merged = group if kept is None else pd.concat([kept, group])
+            samples[irr_bin] = _bottom_k(merged, MEDIAN_SAMPLE_SIZE)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.sqrt(m2 / (count - 1))
+    median = np.full(N_IRR_BINS, np.nan)
+    for irr_bin, sample in samples.items():
+        median[int(irr_bin)] = sample["EFFICIENCY"].median()
+    return median, std, scaler
+
+
+def label_chunk(
+    df: pd.DataFrame, edges: np.ndarray, median: np.ndarray, std: np.ndarray
+) -> pd.DataFrame:
+    """`create_labels` for one chunk, using precomputed per-bin statistics."""
+    irr_bin = pd.cut(df["IRRADIATION"], edges, labels=False).to_numpy(dtype=int)
+    threshold = median[irr_bin] - 1.5 * std[irr_bin]
+    df["IRR_BIN"] = irr_bin
+    df["UNDERPERFORMING"] = (
+        (df["EFFICIENCY"] < threshold) | (df["EFFICIENCY"] == 0)
+    ).astype(int)
+    return df
+
+
+def stratified_reservoir_sample(chunks, size: int, seed: int = 42) -> pd.DataFrame:
+    """Uniform sample of at most `size` rows keeping the UNDERPERFORMING ratio.
+
+    Each class keeps a `size`-row reservoir, so memory stays bounded; at the
+    end classes are cut down to their share of the full stream.
+    """
+    rng = np.random.default_rng(seed)
+    columns = FEATURE_NAMES + ["UNDERPERFORMING"]
+    reservoirs = {}
+    class_counts = {}
+
+    for chunk in chunks:
+        keyed = _add_sample_keys(chunk[columns], rng)
+        for label, group in keyed.groupby("UNDERPERFORMING"):
+            class_counts[label] = class_counts.get(label, 0) + len(group)
+            kept = reservoirs.get(label)
+            merged = group if kept is None else pd.concat([kept, group])
+            reservoirs[label] = _bottom_k(merged, size)
+
+    total = sum(class_counts.values())
+    target = min(size, total)
+    parts = [
+        _bottom_k(reservoirs[label], max(1, round(target * n / total)))
+        for label, n in class_counts.items()
+    ]
+    return pd.concat(parts, ignore_index=True).drop(columns="_KEY")
+
+
 def create_labels(df: pd.DataFrame) -> pd.DataFrame:
     """Label underperforming panels based on efficiency deviation."""
     df["IRR_BIN"] = pd.cut(df["IRRADIATION"], bins=10, labels=False)
@@ -99,8 +248,12 @@ def create_labels(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def train_model(df: pd.DataFrame):
-    """Train RandomForest and return model, scaler, and metrics."""
+def train_model(df: pd.DataFrame, scaler: StandardScaler = None):
+    """Train RandomForest and return model, scaler, and metrics.
+
+    A `scaler` already fit (e.g. incrementally on the full stream) is reused
+    as-is; otherwise one is fit on the training split.
+    """
     X = df[FEATURE_NAMES].copy()
     y = df["UNDERPERFORMING"].copy()
 
@@ -108,8 +261,9 @@ def train_model(df: pd.DataFrame):
         X, y, test_size=0.2, random_state=42, stratify=y
     )
 
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
+    if scaler is None:
+        scaler = StandardScaler().fit(X_train)
+    X_train_scaled = scaler.transform(X_train)
     X_test_scaled = scaler.transform(X_test)
 
     model = RandomForestClassifier(
@@ -130,9 +284,41 @@ def save_model(model, scaler):
     joblib.dump(scaler, MODELS_PATH / "scaler.joblib")
 
 
+def train_chunked(chunksize: int = CHUNK_SIZE):
+    """Out-of-core variant of load/label/train with memory bounded by chunk size.
+
+    Makes three streaming passes over the data: irradiation range, per-bin
+    statistics and scaler, then labelling into a stratified training sample.
+    """
+    print("Finding irradiation range...")
+    irr_min, irr_max = np.inf, -np.inf
+    for chunk in iter_daylight_chunks(chunksize):
+        if not chunk.empty:
+            irr_min = min(irr_min, chunk["IRRADIATION"].min())
+            irr_max = max(irr_max, chunk["IRRADIATION"].max())
+    edges = irradiation_bin_edges(irr_min, irr_max)
+
+    print("Computing per-bin efficiency statistics...")
+    median, std, scaler = compute_bin_stats(iter_daylight_chunks(chunksize), edges)
+
+    print("Labelling and sampling training data...")
+    labelled = (
+        label_chunk(chunk, edges, median, std)
+        for chunk in iter_daylight_chunks(chunksize)
+    )
+    sample = stratified_reservoir_sample(labelled, TRAIN_SAMPLE_SIZE)
+    print(f"Training sample: {len(sample)} records")
+    print(f"Underperforming rate: {sample['UNDERPERFORMING'].mean()*100:.2f}%")
+
+    return train_model(sample, scaler)
+
+
 def setup():
-    """Full pipeline: download data, clean, engineer features, train, and save model."""
-    
+    """Full pipeline: download data, clean, engineer features, train, and save model.
+
+    Set CHUNKED_TRAINING=1 to train out-of-core (see `train_chunked`).
+    """
+
     print("Creating ~/.kaggle/kaggle.json")
     path = Path.home() / ".kaggle"
     path.mkdir(parents=True, exist_ok=True)
@@ -144,20 +330,24 @@ def setup():
     print("Checking/downloading data...")
     download_data()
 
-    print("Loading data...")
-    df = load_data()
-    print(f"Loaded {len(df)} records")
+    if os.getenv("CHUNKED_TRAINING", "0").lower() in ("1", "true", "yes"):
+        print(f"Training model out-of-core (chunks of {CHUNK_SIZE} rows)...")
+        model, scaler, metrics = train_chunked()
+    else:
+        print("Loading data...")
+        df = load_data()
+        print(f"Loaded {len(df)} records")
 
-    print("Cleaning and engineering features...")
-    df = clean_and_engineer_features(df)
-    print(f"Daylight records: {len(df)}")
+        print("Cleaning and engineering features...")
+        df = clean_and_engineer_features(df)
+        print(f"Daylight records: {len(df)}")
 
-    print("Creating labels...")
-    df = create_labels(df)
-    print(f"Underperforming rate: {df['UNDERPERFORMING'].mean()*100:.2f}%")
+        print("Creating labels...")
+        df = create_labels(df)
+        print(f"Underperforming rate: {df['UNDERPERFORMING'].mean()*100:.2f}%")
 
-    print("Training model...")
-    model, scaler, metrics = train_model(df)
+        print("Training model...")
+        model, scaler, metrics = train_model(df)
     print(f"Train accuracy: {metrics['train_accuracy']:.4f}")
     print(f"Test accuracy: {metrics['test_accuracy']:.4f}")
 
@@ -1,9 +1,12 @@
 from fastapi import FastAPI
 from app.src.setup import setup
 from app.src.underperformance import PanelData, check_underperformance
+from app.utils.profiling import install_profiling
 
 _SETUP_DONE = False
 app = FastAPI()
+# check_panel is sync and runs in a worker thread, so sample all threads
+install_profiling(app, default_mode="sample")
 
 
 @app.post("/check-panel")